@@ -1,16 +1,19 @@
 import sys
 import ctypes
+from ctypes import wintypes
 import json
+import math
 import os
-import calendar
-from datetime import datetime
+from datetime import MAXYEAR, MINYEAR, datetime, timedelta
+from datetime import time as dtime
+from time import monotonic
 
 from PySide6.QtWidgets import QApplication, QWidget, QSystemTrayIcon, QMenu
 from PySide6.QtGui import (
     QPainter, QColor, QFont, QBrush,
-    QIcon, QPixmap, QPainterPath, QRegion
+    QIcon, QPixmap, QPainterPath, QRegion, QStaticText, QTransform
 )
-from PySide6.QtCore import Qt, QRectF, QTimer
+from PySide6.QtCore import Qt, QPointF, QRect, QRectF, QTimer
 
 
 # basic config / appearance
@@ -21,16 +24,32 @@ COLOR_TEXT = QColor("#FFFFFF")
 COLOR_DONE = QColor("#FF5722")
 COLOR_FUTURE = QColor("#FFFFFF")
 
+# leap years precomputed over every year datetime can represent
+_LEAP_YEARS = frozenset(
+    y
+    for y in range(MINYEAR, MAXYEAR + 1)
+    if (y % 4 == 0 and y % 100 != 0) or y % 400 == 0
+)
+
 
 # enable high DPI scaling (Qt sometimes behaves weird without this)
 os.environ["QT_ENABLE_HIGHDPI_SCALING"] = "1"
 os.environ["QT_AUTO_SCREEN_SCALE_FACTOR"] = "1"
 
+# improves scaling consistency on Windows
+# per-monitor v2 (-4) needs Win10 1703+, older systems get the shcore API
 try:
-    # improves scaling consistency on Windows
-    ctypes.windll.shcore.SetProcessDpiAwareness(2)
-except:
-    pass
+    _dpi_set = ctypes.windll.user32.SetProcessDpiAwarenessContext(
+        ctypes.c_void_p(-4)
+    )
+except (OSError, AttributeError):
+    _dpi_set = False
+
+if not _dpi_set:
+    try:
+        ctypes.windll.shcore.SetProcessDpiAwareness(2)
+    except (OSError, AttributeError):
+        pass
 
 
 # --- desktop embedding helpers ---
@@ -38,28 +57,89 @@ except:
 # undocumented and may break in future Windows versions
 
 
+def _declare_user32_signatures():
+    # explicit signatures: ctypes otherwise assumes int args/returns, which
+    # truncates 64-bit window handles
+    user32.FindWindowW.argtypes = [wintypes.LPCWSTR, wintypes.LPCWSTR]
+    user32.FindWindowW.restype = wintypes.HWND
+
+    user32.FindWindowExW.argtypes = [
+        wintypes.HWND, wintypes.HWND, wintypes.LPCWSTR, wintypes.LPCWSTR
+    ]
+    user32.FindWindowExW.restype = wintypes.HWND
+
+    user32.SendMessageTimeoutW.argtypes = [
+        wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM,
+        wintypes.UINT, wintypes.UINT, ctypes.POINTER(ctypes.c_size_t),
+    ]
+    user32.SendMessageTimeoutW.restype = wintypes.LPARAM
+
+    user32.EnumWindows.argtypes = [_ENUM_WINDOWS_PROC, wintypes.LPARAM]
+    user32.EnumWindows.restype = wintypes.BOOL
+
+    user32.SetParent.argtypes = [wintypes.HWND, wintypes.HWND]
+    user32.SetParent.restype = wintypes.HWND
+
+    user32.ShowWindow.argtypes = [wintypes.HWND, ctypes.c_int]
+    user32.ShowWindow.restype = wintypes.BOOL
+
+    user32.SetWindowCompositionAttribute.argtypes = [
+        wintypes.HWND, ctypes.c_void_p
+    ]
+    user32.SetWindowCompositionAttribute.restype = wintypes.BOOL
+
+    user32.IsWindow.argtypes = [wintypes.HWND]
+    user32.IsWindow.restype = wintypes.BOOL
+
+
+try:
+    user32 = ctypes.windll.user32
+    # BOOL CALLBACK EnumWindowsProc(HWND, LPARAM) -- both args are pointer-sized
+    _ENUM_WINDOWS_PROC = ctypes.WINFUNCTYPE(
+        ctypes.c_bool, ctypes.c_void_p, ctypes.c_void_p
+    )
+except AttributeError:
+    # not on Windows, the embedding helpers below can't work anyway
+    user32 = None
+    _ENUM_WINDOWS_PROC = None
+else:
+    _declare_user32_signatures()
+
+# WorkerW lookup result, reused for a while so repeated attaches skip the scan
+_WORKERW_TTL = 60.0
+_workerw_cache = (None, 0.0)
+
+
 def get_workerw():
     # tries to locate WorkerW window (sits behind desktop icons)
-    user32 = ctypes.windll.user32
+    global _workerw_cache
+
+    cached, found_at = _workerw_cache
+    fresh = monotonic() - found_at < _WORKERW_TTL
+    if cached and fresh and user32.IsWindow(cached):
+        return cached
+
     progman = user32.FindWindowW("Progman", None)
 
     # undocumented message which forces WorkerW creation
     user32.SendMessageTimeoutW(
-        progman, 0x052C, 0, 0, 0, 1000, ctypes.byref(ctypes.c_ulong())
+        progman, 0x052C, 0, 0, 0, 1000, ctypes.byref(ctypes.c_size_t())
     )
 
     workerw = None
 
     def find_workerw(hwnd, _):
         nonlocal workerw
-        shell = user32.FindWindowExW(hwnd, 0, "SHELLDLL_DefView", None)
+        shell = user32.FindWindowExW(hwnd, None, "SHELLDLL_DefView", None)
         if shell:
-            workerw = user32.FindWindowExW(0, hwnd, "WorkerW", None)
+            workerw = user32.FindWindowExW(None, hwnd, "WorkerW", None)
         return True
 
-    enum_windows = ctypes.WINFUNCTYPE(ctypes.c_bool, ctypes.c_int, ctypes.c_int)
-    user32.EnumWindows(enum_windows(find_workerw), 0)
+    # keep a reference so the callback can't be collected mid-enumeration
+    cb = _ENUM_WINDOWS_PROC(find_workerw)
+    user32.EnumWindows(cb, 0)
 
+    _workerw_cache = (workerw, monotonic())
     return workerw
 
 
@@ -91,7 +171,7 @@ def set_acrylic(hwnd):
     data.Data = ctypes.pointer(accent)
     data.SizeOfData = ctypes.sizeof(accent)
 
-    ctypes.windll.user32.SetWindowCompositionAttribute(hwnd, ctypes.byref(data))
+    user32.SetWindowCompositionAttribute(hwnd, ctypes.byref(data))
 
 
 # main widget
@@ -108,6 +188,35 @@ class YearWidget(QWidget):
         self.padding = 30
         self.text_height = 58
 
+        self._dot_rects = []
+        self._mask_region = None
+        self._mask_size = None
+        self.day_of_year = None
+        self._cached_pixmap = None
+        self._dot_done = None
+        self._dot_future = None
+        self._attach_pending = False
+        self._attached_hwnd = 0
+        self._attached_workerw = None
+
+        # fonts/brushes are reused every paint, no need to rebuild them
+        self._font_small = QFont("Segoe UI", 9)
+        self._font_big = QFont("Segoe UI", 20, QFont.DemiBold)
+        self._bg_brush = QBrush(COLOR_BG)
+
+        # static text keeps its glyph layout, only the percent ever changes;
+        # both are prepared in _render_cache with that render's scale
+        self._label_title = QStaticText("YEAR PROGRESS")
+        self._label_title.setTextFormat(Qt.PlainText)
+        self._label_pct = QStaticText()
+        self._label_pct.setTextFormat(Qt.PlainText)
+
+        # position is written once per drag, not on every move event
+        self._pending_xy = None
+        self._saved_xy = None
+        self._last_move_ts = 0
+        QApplication.instance().aboutToQuit.connect(self._flush_settings)
+
         self.load_settings()
 
         # grab current date info
@@ -126,50 +235,137 @@ class YearWidget(QWidget):
 
         self.setFixedSize(final_size, final_size)
 
+        # grid geometry never changes after this, so compute it once
+        self._rebuild_layout()
+
         # frameless + transparent background
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.Tool)
         self.setAttribute(Qt.WA_TranslucentBackground)
         self.setAttribute(Qt.WA_NoSystemBackground)
 
-        # progress only changes once per day, but 1 minute refresh is safe enough
+        # progress only changes once per day: wake at most hourly (sooner if
+        # midnight is closer) and repaint only when the day actually flips
         self.timer = QTimer(self)
-        self.timer.timeout.connect(self.refresh_date)
-        self.timer.start(60000)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._on_timer)
+        self._schedule_check()
 
         self.setup_tray()
 
     def showEvent(self, event):
         # slight delay needed — window handle must exist first
-        QTimer.singleShot(100, self.attach_window)
+        # only queue one attach even if the widget is shown repeatedly
+        if not self._attach_pending:
+            self._attach_pending = True
+            QTimer.singleShot(100, self.attach_window)
         super().showEvent(event)
 
     def attach_window(self):
+        self._attach_pending = False
         hwnd = int(self.winId())
+        workerw = get_workerw()
+
+        # already parented to a live WorkerW, nothing to redo
+        if hwnd == self._attached_hwnd and workerw == self._attached_workerw:
+            return
 
         set_acrylic(hwnd)
 
-        workerw = get_workerw()
         if workerw:
-            ctypes.windll.user32.SetParent(hwnd, workerw)
-            ctypes.windll.user32.ShowWindow(hwnd, 5)
+            user32.SetParent(hwnd, workerw)
+            user32.ShowWindow(hwnd, 5)
+            self._attached_hwnd = hwnd
+            self._attached_workerw = workerw
 
     def resizeEvent(self, event):
-        # keeps rounded corners after DPI or scaling changes
-        path = QPainterPath()
-        path.addRoundedRect(QRectF(self.rect()), 20, 20)
-        self.setMask(QRegion(path.toFillPolygon().toPolygon()))
+        # rounded corners; the region is in logical coordinates, so it stays
+        # valid across DPI changes and with a fixed size is only built once
+        if event.size() != self._mask_size:
+            self._mask_region = self._rounded_region(self.rect(), 20)
+            self._mask_size = event.size()
+            self.setMask(self._mask_region)
+            self._cached_pixmap = None
         super().resizeEvent(event)
 
+    @staticmethod
+    def _rounded_region(rect, r):
+        # two overlapping rects plus four corner circles, built from native
+        # region shapes instead of tessellating a rounded path
+        d = r * 2
+        region = QRegion(rect.adjusted(0, r, 0, -r)).united(
+            QRegion(rect.adjusted(r, 0, -r, 0))
+        )
+        for x in (rect.left(), rect.right() - d + 1):
+            for y in (rect.top(), rect.bottom() - d + 1):
+                corner = QRegion(QRect(x, y, d, d), QRegion.Ellipse)
+                region = region.united(corner)
+        return region
+
     def refresh_date(self):
         now = datetime.now()
         year = now.year
 
-        self.day_of_year = now.timetuple().tm_yday
-        self.total_days = 366 if calendar.isleap(year) else 365
+        day_of_year = (now - datetime(year, 1, 1)).days + 1
+        if day_of_year == self.day_of_year:
+            return  # nothing visible changed
+
+        self.day_of_year = day_of_year
+        self.total_days = 366 if year in _LEAP_YEARS else 365
         self.percent = (self.day_of_year / self.total_days) * 100
+        self._label_pct.setText(f"{100 - self.percent:.1f}%")
 
+        # dot count changes when the year rolls over into/out of a leap year
+        if self._dot_rects and len(self._dot_rects) != self.total_days:
+            self._rebuild_layout()
+
+        self._cached_pixmap = None
         self.update()
 
+    def _schedule_check(self):
+        now = datetime.now()
+        tomorrow = now.date() + timedelta(days=1)
+        next_midnight = datetime.combine(tomorrow, dtime.min)
+        # small margin so we never land a hair before midnight
+        ms = int((next_midnight - now).total_seconds() * 1000) + 500
+        # wake at least hourly: naive datetimes are off by an hour across DST,
+        # and sleep/resume or clock changes can skew a single long shot.
+        # refresh_date returns early when the day hasn't changed
+        self.timer.start(min(ms, 3_600_000))
+
+    def _on_timer(self):
+        self.refresh_date()
+        self._schedule_check()
+
+    def _rebuild_layout(self):
+        self._cached_pixmap = None
+        rect = QRectF(self.rect())
+
+        # widget background
+        self._bg_path = QPainterPath()
+        self._bg_path.addRoundedRect(rect, 20, 20)
+
+        self._label_rect_top = QRectF(0, self.height() - 55, self.width(), 30)
+        self._label_rect_bot = QRectF(0, self.height() - 30, self.width(), 30)
+
+        # grid positioning
+        self.start_x = (self.width() - self.w_width) // 2
+        self.start_y = (
+            (self.height() - self.w_height - self.text_height) // 2 - 12
+        )
+
+        step = self.dot_size + self.gap
+        self._dot_rects = []
+        for i in range(self.total_days):
+            row, col = divmod(i, self.dots_per_row)
+            self._dot_rects.append(
+                QRectF(
+                    self.start_x + col * step,
+                    self.start_y + row * step,
+                    self.dot_size,
+                    self.dot_size,
+                )
+            )
+
     def setup_tray(self):
         # needed because window has no title bar
         pix = QPixmap(64, 64)
@@ -192,85 +388,154 @@ class YearWidget(QWidget):
             self.drag_start = (
                 e.globalPosition().toPoint() - self.frameGeometry().topLeft()
             )
+            # restart the throttle per drag so a timestamp jump can't stall it
+            self._last_move_ts = e.timestamp()
 
     def mouseMoveEvent(self, e):
         if e.buttons() == Qt.LeftButton:
+            # high polling rate mice flood us, ~60 moves/s is plenty
+            if e.timestamp() - self._last_move_ts < 16:
+                return
+            self._last_move_ts = e.timestamp()
+
             pos = e.globalPosition().toPoint() - self.drag_start
             self.move(pos)
-            self.save_settings(pos.x(), pos.y())
+            self._pending_xy = (pos.x(), pos.y())
+
+    def mouseReleaseEvent(self, e):
+        if e.button() == Qt.LeftButton and self._pending_xy is not None:
+            # the throttle may have skipped the last few moves
+            pos = e.globalPosition().toPoint() - self.drag_start
+            self.move(pos)
+            self._pending_xy = (pos.x(), pos.y())
+            self._flush_settings()
+
+    def closeEvent(self, event):
+        self._flush_settings()
+        super().closeEvent(event)
 
     # drawing
 
     def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-
-        rect = QRectF(self.rect())
+        # the scene only changes once per day, so expose/focus repaints
+        # just blit the cached render
+        dpr = self.devicePixelRatioF()
+        cached = self._cached_pixmap
+        if cached is None or cached.devicePixelRatio() != dpr:
+            self._render_cache(dpr)
 
-        # clear background manually
+        painter = QPainter(self)
+        # Source mode also clears whatever was behind the transparent corners
         painter.setCompositionMode(QPainter.CompositionMode_Source)
-        painter.fillRect(rect, Qt.transparent)
-        painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+        painter.drawPixmap(0, 0, self._cached_pixmap)
 
-        # widget background
-        path = QPainterPath()
-        path.addRoundedRect(rect, 20, 20)
-        painter.fillPath(path, QBrush(COLOR_BG))
+    def _render_cache(self, dpr):
+        pix = QPixmap(self.size() * dpr)
+        pix.setDevicePixelRatio(dpr)
+        pix.fill(Qt.transparent)
 
-        # grid positioning
-        start_x = (self.width() - self.w_width) // 2
-        start_y = (self.height() - self.w_height - self.text_height) // 2 - 12
-
-        painter.setPen(Qt.NoPen)
+        if self._dot_done is None or self._dot_done.devicePixelRatio() != dpr:
+            self._dot_done = self._make_dot_sprite(COLOR_DONE, dpr)
+            self._dot_future = self._make_dot_sprite(COLOR_FUTURE, dpr)
 
-        for i in range(self.total_days):
-            row = i // self.dots_per_row
-            col = i % self.dots_per_row
-
-            x = start_x + col * (self.dot_size + self.gap)
-            y = start_y + row * (self.dot_size + self.gap)
+        painter = QPainter(pix)
+        painter.setRenderHint(QPainter.Antialiasing)
 
-            color = COLOR_DONE if i < self.day_of_year else COLOR_FUTURE
-            painter.setBrush(color)
-            painter.drawEllipse(QRectF(x, y, self.dot_size, self.dot_size))
+        # widget background
+        painter.fillPath(self._bg_path, self._bg_brush)
+
+        # dots are pre-rendered sprites; smooth blits keep the spacing even
+        # when fractional scaling puts them between device pixels
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        for i, r in enumerate(self._dot_rects):
+            painter.drawPixmap(
+                r.topLeft(),
+                self._dot_done if i < self.day_of_year else self._dot_future,
+            )
 
-        # labels
+        # labels, laid out for the pixmap's high-DPI scale so drawStaticText
+        # doesn't have to redo it
+        scale = QTransform.fromScale(dpr, dpr)
+        self._label_title.prepare(scale, self._font_small)
+        self._label_pct.prepare(scale, self._font_big)
 
         painter.setPen(QColor(140, 140, 145))
-        painter.setFont(QFont("Segoe UI", 9))
-        painter.drawText(
-            QRectF(0, self.height() - 55, self.width(), 30),
-            Qt.AlignCenter,
-            "YEAR PROGRESS",
-        )
+        painter.setFont(self._font_small)
+        self._draw_centered(painter, self._label_rect_top, self._label_title)
 
         painter.setPen(COLOR_TEXT)
-        painter.setFont(QFont("Segoe UI", 20, QFont.DemiBold))
-        painter.drawText(
-            QRectF(0, self.height() - 30, self.width(), 30),
-            Qt.AlignCenter,
-            f"{100 - self.percent:.1f}%",
+        painter.setFont(self._font_big)
+        self._draw_centered(painter, self._label_rect_bot, self._label_pct)
+
+        painter.end()
+        self._cached_pixmap = pix
+
+    @staticmethod
+    def _draw_centered(painter, rect, text):
+        # QStaticText has no alignment, so center it in the rect by hand
+        size = text.size()
+        painter.drawStaticText(
+            QPointF(
+                rect.x() + (rect.width() - size.width()) / 2,
+                rect.y() + (rect.height() - size.height()) / 2,
+            ),
+            text,
         )
 
+    def _make_dot_sprite(self, color, dpr):
+        # one antialiased dot, rasterized once and reused for the whole grid
+        # round up, otherwise fractional scales clip the dot's right/bottom edge
+        side = math.ceil(self.dot_size * dpr)
+        pix = QPixmap(side, side)
+        pix.setDevicePixelRatio(dpr)
+        pix.fill(Qt.transparent)
+
+        painter = QPainter(pix)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(color)
+        painter.drawEllipse(QRectF(0, 0, self.dot_size, self.dot_size))
+        painter.end()
+
+        return pix
+
     # position persistence
 
     def load_settings(self):
         if os.path.exists(CONFIG_FILE):
             try:
-                data = json.load(open(CONFIG_FILE))
-                self.move(data.get("x", 100), data.get("y", 100))
-            except:
-                pass
+                with open(CONFIG_FILE) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                return  # unreadable/corrupt config, keep default position
+
+            if not isinstance(data, dict):
+                return
+            x, y = data.get("x", 100), data.get("y", 100)
+            if isinstance(x, int) and isinstance(y, int):
+                self._saved_xy = (x, y)
+                self.move(x, y)
 
     def save_settings(self, x, y):
+        if (x, y) == self._saved_xy:
+            return
         try:
             with open(CONFIG_FILE, "w") as f:
                 json.dump({"x": x, "y": y}, f)
-        except:
+            self._saved_xy = (x, y)
+        except OSError:
             pass
 
+    def _flush_settings(self):
+        if self._pending_xy is not None:
+            self.save_settings(*self._pending_xy)
+            self._pending_xy = None
+
 
 if __name__ == "__main__":
+    # merge queued mouse moves so dragging doesn't lag behind the cursor
+    QApplication.setAttribute(Qt.AA_CompressHighFrequencyEvents, True)
+
     app = QApplication(sys.argv)
 
     if hasattr(Qt, "HighDpiScaleFactorRoundingPolicy"):